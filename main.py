@@ -7,6 +7,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import ttkbootstrap as ttk_style
 from ttkbootstrap.constants import *
+import logging
 import threading
 import time
 import os
@@ -17,7 +18,7 @@ from pathlib import Path
 from src.audio_capture import AudioCapture
 from src.whisper_manager import WhisperManager
 from src.text_injector import TextInjector
-from src.config_manager import ConfigManager
+from src.config_manager import get_config_manager
 from src.global_shortcuts import GlobalShortcuts
 from src.waveform_visualizer import WaveformVisualizer
 
@@ -893,13 +894,13 @@ class WhisperTuxApp:
 
     def __init__(self):
         # Initialize core components first
-        self.config = ConfigManager()
+        self.config = get_config_manager()
 
         # Initialize audio capture with configured device
         audio_device_id = self.config.get_setting('audio_device', None)
         self.audio_capture = AudioCapture(device_id=audio_device_id)
 
-        self.whisper_manager = WhisperManager()
+        self.whisper_manager = WhisperManager(self.config)
         self.text_injector = TextInjector(self.config)
         self.global_shortcuts = None
 
@@ -1582,6 +1583,8 @@ class WhisperTuxApp:
                     ], cwd=str(models_dir), capture_output=True, text=True)
 
                     if result.returncode == 0:
+                        # New model file on disk; drop previously resolved paths
+                        self.config.reset_model_cache()
                         dialog.after(100, lambda: status_label.config(text=f"✅ {selected_model} downloaded successfully!"))
                         dialog.after(100, lambda: progress.stop())
                         # Refresh model combo in main window
@@ -1648,6 +1651,10 @@ class WhisperTuxApp:
             if self.waveform_visualizer:
                 self.waveform_visualizer.stop_animation()
 
+            # Drop any pending clipboard restore
+            if self.text_injector:
+                self.text_injector.stop()
+
             # Save configuration
             self.config.save_config()
 
@@ -1676,6 +1683,11 @@ class WhisperTuxApp:
 
 def main():
     """Main entry point"""
+    # Modules log through stdlib logging under "whispertux"; show their info
+    # and above on the console without raising third-party library verbosity
+    logging.basicConfig(format='%(levelname)s: %(message)s')
+    logging.getLogger('whispertux').setLevel(logging.INFO)
+
     # Ensure we're running on Linux (since this uses ydotool)
     if not sys.platform.startswith('linux'):
         try:
@@ -3,10 +3,56 @@ Configuration manager for WhisperTux
 Handles loading, saving, and managing application settings
 """
 
-import json
+import logging
 import os
 from pathlib import Path
-from typing import Any, Dict, Optional
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    _loads = orjson.loads
+except ImportError:
+    import json
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, indent=2).encode('utf-8')
+
+    _loads = json.loads
+
+try:
+    from .logger import log_warning
+except ImportError:
+    def log_warning(message: str, prefix: str = "WARNING"):
+        print(f"Warning [{prefix}]: {message}")
+
+
+log = logging.getLogger('whispertux.config')
+
+# Resolved once at import as plain strings so hot paths can use os.path
+# directly; values are only wrapped in Path at the public API boundary
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_WHISPER_DIR = os.path.join(_PROJECT_ROOT, 'whisper.cpp')
+_MODELS_DIR = os.path.join(_WHISPER_DIR, 'models')
+
+# Expected value types for settings loaded from disk; settings not listed
+# here (e.g. window_position, audio_device) accept any JSON value
+_SETTING_TYPES = {
+    'primary_shortcut': str,
+    'model': str,
+    'key_delay': int,
+    'use_clipboard': bool,
+    'preserve_clipboard': bool,
+    'always_on_top': bool,
+    'theme': str,
+    'word_overrides': dict,
+    'push_to_talk': bool,
+    'keyboard_device': str,
+}
 
 
 class ConfigManager:
@@ -19,148 +65,283 @@ class ConfigManager:
             'model': 'base',
             'key_delay': 15,  # Delay between keystrokes in milliseconds for ydotool
             'use_clipboard': False,
+            'preserve_clipboard': True,  # Restore the previous clipboard after clipboard injection
             'window_position': None,
             'always_on_top': True,
             'theme': 'darkly',
             'audio_device': None,  # None means use system default
             'word_overrides': {},  # Dictionary of word replacements: {"original": "replacement"}
-            'push_to_talk': False  # Hold key to record, release to stop
+            'push_to_talk': False,  # Hold key to record, release to stop
+            'keyboard_device': ''  # Empty means auto-detect
         }
+        self._valid_keys = frozenset(self.default_config)
         
-        # Set up config directory and file path
-        self.config_dir = Path.home() / '.config' / 'whispertux'
-        self.config_file = self.config_dir / 'config.json'
+        # Set up config directory and file path (kept as strings for os.path;
+        # HOME is read here, at construction, like Path.home() was)
+        self._config_dir = os.path.join(os.path.expanduser('~'), '.config', 'whispertux')
+        self._config_file = os.path.join(self._config_dir, 'config.json')
         
         # Current configuration (starts with defaults)
         self.config = self.default_config.copy()
-        
-        # Ensure config directory exists
-        self._ensure_config_dir()
-        
-        # Load existing configuration
-        self._load_config()
+        # Read-only live view handed out by get_all_settings
+        self._config_view = MappingProxyType(self.config)
+
+        # Resolved whisper.cpp paths, probed lazily (see reset_model_cache)
+        self._model_path_cache: Dict[str, Path] = {}
+        self._binary_path: Optional[Path] = None
+
+        # The config file is read on first access rather than at construction
+        self._loaded = False
+
+        # Unsaved changes since the last load/save, and the bytes last written
+        self._dirty = False
+        self._last_written: Optional[bytes] = None
+
+    @property
+    def config_dir(self) -> Path:
+        """Directory holding the configuration file"""
+        return Path(self._config_dir)
+
+    @config_dir.setter
+    def config_dir(self, value):
+        self._config_dir = os.fspath(value)
+
+    @property
+    def config_file(self) -> Path:
+        """Path of the configuration file"""
+        return Path(self._config_file)
+
+    @config_file.setter
+    def config_file(self, value):
+        self._config_file = os.fspath(value)
+
+    def _ensure_loaded(self):
+        """Load the configuration file the first time settings are accessed"""
+        if not self._loaded:
+            self._loaded = True
+            self._load_config()
     
     def _ensure_config_dir(self):
         """Ensure the configuration directory exists"""
         try:
-            self.config_dir.mkdir(parents=True, exist_ok=True)
+            # The file's own directory, in case config_file was pointed elsewhere
+            os.makedirs(os.path.dirname(os.path.abspath(self._config_file)), exist_ok=True)
         except Exception as e:
-            try:
-                from .logger import log_warning
-                log_warning(f"Could not create config directory: {e}", "CONFIG")
-            except ImportError:
-                print(f"Warning: Could not create config directory: {e}")
+            log_warning(f"Could not create config directory: {e}", "CONFIG")
     
     def _load_config(self):
         """Load configuration from file"""
         try:
-            if self.config_file.exists():
-                with open(self.config_file, 'r') as f:
-                    loaded_config = json.load(f)
-                    
+            if os.path.exists(self._config_file):
+                with open(self._config_file, 'rb') as f:
+                    loaded_config = _loads(f.read())
+
                 # Merge loaded config with defaults (preserving any new default keys)
-                self.config.update(loaded_config)
-                print(f"Configuration loaded from {self.config_file}")
+                self.config.update(self._validate_loaded_config(loaded_config))
+                self._dirty = False
+                log.info("Configuration loaded from %s", self._config_file)
             else:
-                print("No existing configuration found, using defaults")
-                # Save default configuration
-                self.save_config()
+                log.info("No existing configuration found, using defaults")
+                # Defaults are written by the next save_config (at the latest on exit)
+                self._dirty = True
                 
         except Exception as e:
-            print(f"Warning: Could not load configuration: {e}")
-            print("Using default configuration")
+            log.warning("Could not load configuration: %s", e)
+            log.warning("Using default configuration")
     
+    def _validate_loaded_config(self, loaded_config: Any) -> Dict[str, Any]:
+        """Keep only known settings whose values have the expected type"""
+        if not isinstance(loaded_config, dict):
+            log.warning("Ignoring configuration file: expected a JSON object")
+            return {}
+
+        valid_config = {}
+        for key, value in loaded_config.items():
+            if key not in self._valid_keys:
+                log.debug("Ignoring unknown setting %r", key)
+                continue
+
+            expected_type = _SETTING_TYPES.get(key)
+            if expected_type is not None and type(value) is not expected_type:
+                if expected_type is int and isinstance(value, float) and value.is_integer():
+                    value = int(value)
+                else:
+                    log.debug("Ignoring setting %r: expected %s, got %s",
+                              key, expected_type.__name__, type(value).__name__)
+                    continue
+
+            valid_config[key] = value
+        return valid_config
+
     def save_config(self) -> bool:
-        """Save current configuration to file"""
+        """Save current configuration to file (no-op if nothing changed)"""
+        self._ensure_loaded()
+        if not self._dirty:
+            return True
+
         try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.config, f, indent=2)
-            print(f"Configuration saved to {self.config_file}")
+            data = _dumps(self.config)
+            # Values may have been changed and then changed back
+            if data == self._last_written:
+                self._dirty = False
+                return True
+
+            self._ensure_config_dir()
+            # Write to a sibling temp file and rename over the original so a
+            # crash mid-write never leaves a truncated config behind
+            tmp_file = self._config_file + '.tmp'
+            try:
+                with open(tmp_file, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_file, self._config_file)
+            except Exception:
+                # Don't leave a partial temp file next to the real config
+                try:
+                    os.unlink(tmp_file)
+                except OSError:
+                    pass
+                raise
+            self._last_written = data
+            self._dirty = False
+            log.debug("Configuration saved to %s", self._config_file)
             return True
         except Exception as e:
-            print(f"Error: Could not save configuration: {e}")
+            log.error("Could not save configuration: %s", e)
             return False
     
     def get_setting(self, key: str, default: Any = None) -> Any:
         """Get a configuration setting"""
+        self._ensure_loaded()
         return self.config.get(key, default)
     
     def set_setting(self, key: str, value: Any):
         """Set a configuration setting"""
-        self.config[key] = value
+        self._ensure_loaded()
+        if key not in self.config or self.config[key] != value:
+            self.config[key] = value
+            self._dirty = True
     
-    def get_all_settings(self) -> Dict[str, Any]:
-        """Get all configuration settings"""
-        return self.config.copy()
+    def get_all_settings(self) -> Mapping[str, Any]:
+        """
+        Get all configuration settings as a read-only live view
+
+        Use dict(...) on the result if a mutable snapshot is needed.
+        """
+        self._ensure_loaded()
+        return self._config_view
     
     def reset_to_defaults(self):
         """Reset configuration to default values"""
-        self.config = self.default_config.copy()
-        print("Configuration reset to defaults")
+        self._ensure_loaded()
+        # Reset in place so the view from get_all_settings stays valid
+        self.config.clear()
+        self.config.update(self.default_config)
+        self._dirty = True
+        log.info("Configuration reset to defaults")
     
     def update_shortcuts(self, primary: Optional[str] = None, secondary: Optional[str] = None):
         """Update shortcut configuration"""
+        self._ensure_loaded()
         if primary is not None:
-            self.config['primary_shortcut'] = primary
+            self.set_setting('primary_shortcut', primary)
             
         return self.save_config()
     
     def get_whisper_model_path(self, model_name: str) -> Path:
         """Get the path to a whisper model file"""
-        # Construct path relative to the project root
-        project_root = Path(__file__).parent.parent
-        models_dir = project_root / "whisper.cpp" / "models"
+        model_path = self._model_path_cache.get(model_name)
+        if model_path is None:
+            model_path = self._find_whisper_model_path(model_name)
+            self._model_path_cache[model_name] = model_path
+        return model_path
 
-        exact_model_path = models_dir / f"ggml-{model_name}.bin"
-        if exact_model_path.exists() or model_name.endswith('.en'):
-            return exact_model_path
+    def _find_whisper_model_path(self, model_name: str) -> Path:
+        """Probe the models directory for a whisper model file"""
+        exact_model_path = os.path.join(_MODELS_DIR, f"ggml-{model_name}.bin")
+        if model_name.endswith('.en') or os.path.exists(exact_model_path):
+            return Path(exact_model_path)
 
         # Keep the historical default working when config says "base" but only
         # the setup-downloaded English model exists as ggml-base.en.bin.
-        en_model_path = models_dir / f"ggml-{model_name}.en.bin"
-        if en_model_path.exists():
-            return en_model_path
+        en_model_path = os.path.join(_MODELS_DIR, f"ggml-{model_name}.en.bin")
+        if os.path.exists(en_model_path):
+            return Path(en_model_path)
 
-        return exact_model_path
+        return Path(exact_model_path)
     
     def get_whisper_binary_path(self) -> Path:
         """Get the path to the whisper binary"""
-        project_root = Path(__file__).parent.parent
+        if self._binary_path is None:
+            self._binary_path = self._find_whisper_binary_path()
+        return self._binary_path
+
+    def _find_whisper_binary_path(self) -> Path:
+        """Probe the whisper.cpp tree for the whisper binary"""
         # Check a few possible locations for the whisper binary
         possible_paths = [
-            project_root / "whisper.cpp" / "build" / "bin" / "whisper-cli",
-            project_root / "whisper.cpp" / "main",
-            project_root / "whisper.cpp" / "whisper"
+            os.path.join(_WHISPER_DIR, "build", "bin", "whisper-cli"),
+            os.path.join(_WHISPER_DIR, "main"),
+            os.path.join(_WHISPER_DIR, "whisper")
         ]
         
         for path in possible_paths:
-            if path.exists():
-                return path
+            if os.path.exists(path):
+                return Path(path)
                 
         # Return the most likely path even if it doesn't exist yet
-        return possible_paths[0]
+        return Path(possible_paths[0])
+
+    def reset_model_cache(self):
+        """Forget resolved model/binary paths, e.g. after downloading a new model"""
+        self._model_path_cache.clear()
+        self._binary_path = None
     
     def get_temp_directory(self) -> Path:
         """Get the temporary directory for audio files"""
-        temp_dir = Path(__file__).parent.parent / "temp"
+        temp_dir = Path(_PROJECT_ROOT) / "temp"
         temp_dir.mkdir(exist_ok=True)
         return temp_dir
     
     def get_word_overrides(self) -> Dict[str, str]:
         """Get the word overrides dictionary"""
+        self._ensure_loaded()
         return self.config.get('word_overrides', {}).copy()
     
     def add_word_override(self, original: str, replacement: str):
         """Add or update a word override"""
+        self._ensure_loaded()
         if 'word_overrides' not in self.config:
             self.config['word_overrides'] = {}
         self.config['word_overrides'][original.lower().strip()] = replacement.strip()
+        self._dirty = True
     
     def remove_word_override(self, original: str):
         """Remove a word override"""
+        self._ensure_loaded()
         if 'word_overrides' in self.config:
-            self.config['word_overrides'].pop(original.lower().strip(), None)
+            if self.config['word_overrides'].pop(original.lower().strip(), None) is not None:
+                self._dirty = True
     
     def clear_word_overrides(self):
         """Clear all word overrides"""
+        self._ensure_loaded()
+        if self.config.get('word_overrides'):
+            self._dirty = True
         self.config['word_overrides'] = {}
+
+
+_config_manager: Optional[ConfigManager] = None
+
+
+def get_config_manager() -> ConfigManager:
+    """Get the process-wide ConfigManager, creating it on first use"""
+    global _config_manager
+    if _config_manager is None:
+        _config_manager = ConfigManager()
+    return _config_manager
+
+
+def reset_config_manager():
+    """Drop the shared ConfigManager so the next get_config_manager() creates a fresh one"""
+    global _config_manager
+    _config_manager = None
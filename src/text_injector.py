@@ -3,48 +3,210 @@ Text injector for WhisperTux
 Handles injecting transcribed text into other applications using ydotool
 """
 
+import functools
+import logging
+import re
+import shutil
 import subprocess
+import threading
 import time
 import pyperclip
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    from .config_manager import get_config_manager
+except ImportError:
+    from config_manager import get_config_manager
+
+
+log = logging.getLogger('whispertux.injector')
+
+# Spoken phrases that are converted to punctuation/symbols during preprocessing
+_SPOKEN_PUNCTUATION = {
+    'period': '.',
+    'comma': ',',
+    'question mark': '?',
+    'exclamation mark': '!',
+    'colon': ':',
+    'semicolon': ';',
+    'tux enter': '\n',     # Special phrase for new line
+    'tab': '\t',
+    'dash': '-',
+    'underscore': '_',
+    'open paren': '(',
+    'close paren': ')',
+    'open bracket': '[',
+    'close bracket': ']',
+    'open brace': '{',
+    'close brace': '}',
+    'at symbol': '@',
+    'hash': '#',
+    'dollar sign': '$',
+    'percent': '%',
+    'caret': '^',
+    'ampersand': '&',
+    'asterisk': '*',
+    'plus': '+',
+    'equals': '=',
+    'less than': '<',
+    'greater than': '>',
+    'slash': '/',
+    'backslash': '\\',
+    'pipe': '|',
+    'tilde': '~',
+    'grave': '`',
+    'quote': '"',
+    'apostrophe': "'",
+}
+
+# One alternation over all phrases so the text is scanned once; longest
+# phrases first so overlapping prefixes can never shadow a longer match
+_SPOKEN_PUNCTUATION_RE = re.compile(
+    r'\b(' + '|'.join(
+        re.escape(phrase)
+        for phrase in sorted(_SPOKEN_PUNCTUATION, key=len, reverse=True)
+    ) + r')\b',
+    re.IGNORECASE
+)
+
+
+def _build_spoken_punctuation_automaton():
+    """Build an Aho-Corasick automaton over the spoken phrases (None without pyahocorasick)"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for phrase, replacement in _SPOKEN_PUNCTUATION.items():
+        automaton.add_word(phrase, (len(phrase), replacement))
+    automaton.make_automaton()
+    return automaton
+
+
+_SPOKEN_PUNCTUATION_AUTOMATON = _build_spoken_punctuation_automaton()
+
+
+def _is_word_char(char: str) -> bool:
+    """Match the regex notion of a word character used by \\b"""
+    return char.isalnum() or char == '_'
+
+
+def _replace_spoken_punctuation(text: str) -> str:
+    """Replace whole-word spoken phrases with their punctuation in one linear pass"""
+    lowered = text.lower()
+    # Lowercasing can change the length of some non-ASCII text, which would
+    # break index alignment, so let the regex handle those inputs
+    if _SPOKEN_PUNCTUATION_AUTOMATON is None or len(lowered) != len(text):
+        return _SPOKEN_PUNCTUATION_RE.sub(
+            lambda match: _SPOKEN_PUNCTUATION[match.group(1).lower()], text
+        )
+
+    # Collect whole-word matches, then keep the leftmost-longest
+    # non-overlapping ones (same result as the regex alternation)
+    matches = []
+    for end_index, (length, replacement) in _SPOKEN_PUNCTUATION_AUTOMATON.iter(lowered):
+        start = end_index - length + 1
+        end = end_index + 1
+        if start > 0 and _is_word_char(text[start - 1]):
+            continue
+        if end < len(text) and _is_word_char(text[end]):
+            continue
+        matches.append((start, -length, replacement))
+
+    if not matches:
+        return text
+
+    matches.sort()
+    pieces = []
+    position = 0
+    for start, negative_length, replacement in matches:
+        if start < position:
+            continue
+        pieces.append(text[position:start])
+        pieces.append(replacement)
+        position = start - negative_length
+    pieces.append(text[position:])
+    return ''.join(pieces)
+
+
+def _collapse_spaces(text: str) -> str:
+    """Collapse runs of spaces/tabs to one space and trim them at both ends"""
+    # Only ' ' and '\t' count here (bare str.split() would also eat NBSP,
+    # form feeds, etc.), matching the original [ \t]+ cleanup
+    return ' '.join(filter(None, text.replace('\t', ' ').split(' ')))
+
+
+# ydotool key events for Ctrl+V (29 = KEY_LEFTCTRL, 47 = KEY_V; :1 press, :0 release)
+_CTRL_V_KEY_EVENTS = ('29:1', '47:1', '47:0', '29:0')
+
+
+@functools.lru_cache(maxsize=1)
+def _find_ydotool() -> Optional[str]:
+    """Locate the ydotool binary once per process"""
+    return shutil.which('ydotool')
+
+
+@functools.lru_cache(maxsize=1)
+def _find_clipboard_commands() -> Optional[Tuple[Tuple[str, ...], Tuple[str, ...]]]:
+    """Pick native (copy, paste) clipboard commands once per process, or None for pyperclip"""
+    if os.environ.get('WAYLAND_DISPLAY'):
+        wl_copy = shutil.which('wl-copy')
+        wl_paste = shutil.which('wl-paste')
+        if wl_copy and wl_paste:
+            # Ask for text explicitly so image/binary clipboards fail the snapshot
+            return (wl_copy,), (wl_paste, '--no-newline', '--type', 'text')
+
+    if os.environ.get('DISPLAY'):
+        xclip = shutil.which('xclip')
+        if xclip:
+            return (xclip, '-selection', 'clipboard'), (xclip, '-selection', 'clipboard', '-o')
+
+    return None
 
 
 class TextInjector:
     """Handles injecting text into focused applications"""
 
     def __init__(self, config_manager=None):
-        # Configuration
+        # Configuration (shared application config unless one is passed in)
+        if config_manager is None:
+            config_manager = get_config_manager()
         self.config_manager = config_manager
 
-        # Initialize settings from config if available
-        if self.config_manager:
-            self.key_delay = self.config_manager.get_setting('key_delay', 15)
-            self.use_clipboard_fallback = self.config_manager.get_setting('use_clipboard', False)
-        else:
-            self.key_delay = 15  # Default key delay in milliseconds
-            self.use_clipboard_fallback = False
+        # Initialize settings from config
+        self.key_delay = self.config_manager.get_setting('key_delay', 15)  # Milliseconds
+        self.use_clipboard_fallback = self.config_manager.get_setting('use_clipboard', False)
+        self.preserve_clipboard = self.config_manager.get_setting('preserve_clipboard', True)
 
         # Check if ydotool is available
-        self.ydotool_available = self._check_ydotool()
+        self.ydotool_path = _find_ydotool()
+        self.ydotool_available = self.ydotool_path is not None
         self.ydotool_socket = self._detect_ydotool_socket()
 
-        if not self.ydotool_available:
-            print("⚠️  ydotool not found - text injection will use clipboard fallback")
-        elif self.ydotool_socket:
-            print(f"Using ydotool socket: {self.ydotool_socket}")
+        # Paste argv is fixed for the session, so build it once
+        self._ctrl_v_cmd = (self.ydotool_path, 'key') + _CTRL_V_KEY_EVENTS if self.ydotool_available else None
 
-    def _check_ydotool(self) -> bool:
-        """Check if ydotool is available on the atiystem"""
-        try:
-            result = subprocess.run(['which', 'ydotool'],
-                                  capture_output=True, text=True, timeout=5)
-            return result.returncode == 0
+        # Native clipboard commands; pyperclip is only used when none are found
+        clipboard_commands = _find_clipboard_commands()
+        if clipboard_commands:
+            self._copy_cmd, self._paste_cmd = clipboard_commands
+        else:
+            self._copy_cmd = self._paste_cmd = None
 
+        # Single pending clipboard restore, rescheduled on every clipboard injection
+        self._restore_lock = threading.Lock()
+        self._restore_timer: Optional[threading.Timer] = None
+        self._clipboard_to_restore = ""
 
-        except:
-            return False
+        if not self.ydotool_available:
+            log.warning("ydotool not found - text injection will use clipboard fallback")
+        elif self.ydotool_socket:
+            log.info("Using ydotool socket: %s", self.ydotool_socket)
 
     def _detect_ydotool_socket(self) -> Optional[str]:
         """Find the ydotoold socket used by common package/service setups."""
@@ -75,30 +237,30 @@ class TextInjector:
 
     def _log_ydotool_failure(self, result: subprocess.CompletedProcess):
         """Log enough detail to diagnose ydotool daemon/socket failures."""
-        print(f"ERROR: ydotool failed with exit code {result.returncode}")
+        log.error("ydotool failed with exit code %d", result.returncode)
 
         stdout = (result.stdout or '').strip()
         stderr = (result.stderr or '').strip()
         if stdout:
-            print(f"ydotool stdout: {stdout}")
+            log.error("ydotool stdout: %s", stdout)
         if stderr:
-            print(f"ydotool stderr: {stderr}")
+            log.error("ydotool stderr: %s", stderr)
         if not stdout and not stderr:
-            print("ydotool did not print any error output")
+            log.error("ydotool did not print any error output")
 
         socket_path = self.ydotool_socket or os.environ.get('YDOTOOL_SOCKET')
         if socket_path:
             socket_file = Path(socket_path)
-            print(f"ydotool socket: {socket_path}")
+            log.error("ydotool socket: %s", socket_path)
             if socket_file.exists():
                 socket_readable = os.access(socket_path, os.R_OK)
                 socket_writable = os.access(socket_path, os.W_OK)
-                print(f"ydotool socket readable={socket_readable} writable={socket_writable}")
+                log.error("ydotool socket readable=%s writable=%s", socket_readable, socket_writable)
                 if not socket_readable or not socket_writable:
-                    print("ydotool socket is not accessible by the current user.")
-                    print("Run: ./scripts/setup-ydotoold-service.sh")
+                    log.error("ydotool socket is not accessible by the current user.")
+                    log.error("Run: ./scripts/setup-ydotoold-service.sh")
             else:
-                print("ydotool socket does not exist")
+                log.error("ydotool socket does not exist")
 
     def inject_text(self, text: str) -> bool:
         """
@@ -111,7 +273,7 @@ class TextInjector:
             True if successful, False otherwise
         """
         if not text or text.strip() == "":
-            print("No text to inject (empty or whitespace)")
+            log.debug("No text to inject (empty or whitespace)")
             return True
 
         # Preprocess the text to handle unwanted carriage returns and speech-to-text corrections
@@ -126,15 +288,15 @@ class TextInjector:
                 return self._inject_via_clipboard(processed_text)
 
         except Exception as e:
-            print(f"Primary injection method failed: {e}")
+            log.warning("Primary injection method failed: %s", e)
 
             # Try clipboard fallback if ydotool failed
             if self.ydotool_available and self.use_clipboard_fallback:
-                print("Falling back to clipboard method...")
+                log.info("Falling back to clipboard method...")
                 try:
                     return self._inject_via_clipboard(processed_text)
                 except Exception as e2:
-                    print(f"Clipboard fallback also failed: {e2}")
+                    log.error("Clipboard fallback also failed: %s", e2)
 
             return False
 
@@ -142,59 +304,24 @@ class TextInjector:
         """
         Preprocess text to handle common speech-to-text corrections and remove unwanted line breaks
         """
-        import re
-        
         # First, convert unwanted carriage returns and newlines to spaces
         # This prevents accidental "Enter" key presses in applications
         processed = text.replace('\r\n', ' ').replace('\r', ' ').replace('\n', ' ')
         
         # Apply user-defined word overrides first (before built-in corrections)
         processed = self._apply_word_overrides(processed)
-        
-        # Handle common speech-to-text corrections
-        replacements = {
-            r'\bperiod\b': '.',
-            r'\bcomma\b': ',',
-            r'\bquestion mark\b': '?',
-            r'\bexclamation mark\b': '!',
-            r'\bcolon\b': ':',
-            r'\bsemicolon\b': ';',
-            r'\btux enter\b': '\n',     # Special phrase for new line
-            r'\btab\b': '\t',
-            r'\bdash\b': '-',
-            r'\bunderscore\b': '_',
-            r'\bopen paren\b': '(',
-            r'\bclose paren\b': ')',
-            r'\bopen bracket\b': '[',
-            r'\bclose bracket\b': ']',
-            r'\bopen brace\b': '{',
-            r'\bclose brace\b': '}',
-            r'\bat symbol\b': '@',
-            r'\bhash\b': '#',
-            r'\bdollar sign\b': '$',
-            r'\bpercent\b': '%',
-            r'\bcaret\b': '^',
-            r'\bampersand\b': '&',
-            r'\basterisk\b': '*',
-            r'\bplus\b': '+',
-            r'\bequals\b': '=',
-            r'\bless than\b': '<',
-            r'\bgreater than\b': '>',
-            r'\bslash\b': '/',
-            r'\bbackslash\b': r'\\',
-            r'\bpipe\b': '|',
-            r'\btilde\b': '~',
-            r'\bgrave\b': '`',
-            r'\bquote\b': '"',
-            r'\bapostrophe\b': "'",
-        }
 
-        for pattern, replacement in replacements.items():
-            processed = re.sub(pattern, replacement, processed, flags=re.IGNORECASE)
+        # Fast path: most transcriptions contain no spoken punctuation, and with
+        # line breaks already flattened only horizontal whitespace needs cleanup
+        if '\n' not in processed and _SPOKEN_PUNCTUATION_RE.search(processed) is None:
+            return _collapse_spaces(processed).strip()
+
+        # Handle common speech-to-text corrections in a single pass
+        processed = _replace_spoken_punctuation(processed)
 
-        # Clean up extra spaces but preserve intentional newlines
-        processed = re.sub(r'[ \t]+', ' ', processed)  # Multiple spaces/tabs to single space
-        processed = re.sub(r' *\n *', '\n', processed)  # Clean spaces around newlines
+        # Clean up extra spaces but preserve intentional newlines: collapse
+        # whitespace runs within each line, which also trims around newlines
+        processed = '\n'.join(_collapse_spaces(line) for line in processed.split('\n'))
         processed = processed.strip()
 
         return processed
@@ -203,11 +330,6 @@ class TextInjector:
         """
         Apply user-defined word overrides to the text
         """
-        import re
-        
-        if not self.config_manager:
-            return text
-        
         # Get word overrides from configuration
         word_overrides = self.config_manager.get_word_overrides()
         
@@ -229,9 +351,11 @@ class TextInjector:
     def _inject_via_ydotool(self, text: str) -> bool:
         """Inject text using ydotool with configurable --key-delay and raw text (no escaping)"""
         try:
-            cmd = ['ydotool', 'type', '--key-delay', str(self.key_delay), text]
+            # argv goes straight to execve, so the text needs no shell quoting;
+            # '--' keeps text that starts with '-' from being parsed as options
+            cmd = [self.ydotool_path, 'type', '--key-delay', str(self.key_delay), '--', text]
             
-            print(f"Injecting text with ydotool: ydotool type --key-delay {self.key_delay} [text]")
+            log.debug("Injecting text with ydotool: ydotool type --key-delay %s -- [text]", self.key_delay)
 
             # Run the command
             result = subprocess.run(
@@ -249,32 +373,85 @@ class TextInjector:
                 return False
 
         except subprocess.TimeoutExpired:
-            print("ERROR: ydotool command timed out")
+            log.error("ydotool command timed out")
             return False
         except Exception as e:
-            print(f"ERROR: ydotool injection failed: {e}")
+            log.error("ydotool injection failed: %s", e)
             return False
 
+    def _copy_to_clipboard(self, text: str):
+        """Put text on the clipboard"""
+        if self._copy_cmd is None:
+            pyperclip.copy(text)
+            return
+        # wl-copy/xclip fork a process that keeps serving the selection, so
+        # don't hand it our pipes or run() would wait for it to exit
+        subprocess.run(
+            self._copy_cmd,
+            input=text.encode('utf-8'),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            timeout=2
+        )
+
+    def _paste_from_clipboard(self, timeout: float = 2) -> str:
+        """Read the current clipboard text"""
+        if self._paste_cmd is None:
+            return pyperclip.paste()
+        return subprocess.check_output(
+            self._paste_cmd, stderr=subprocess.DEVNULL, timeout=timeout
+        ).decode('utf-8')
+
+    def _wait_for_clipboard(self, text: str, timeout: float = 0.1, interval: float = 0.01):
+        """Poll the clipboard until it contains text, giving up after timeout seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            # Bound each read by the time left so a hung paste tool can't
+            # stretch the wait past the deadline
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                if self._paste_from_clipboard(timeout=remaining) == text:
+                    return
+            except Exception:
+                pass
+            time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+
     def _inject_via_clipboard(self, text: str) -> bool:
         """Inject text using clipboard + paste key combination"""
         try:
-            # Save current clipboard content
-            try:
-                original_clipboard = pyperclip.paste()
-            except:
-                original_clipboard = ""
+            # Save current clipboard content, unless a restore is still pending:
+            # then the clipboard holds our previous injection, not the user's data.
+            # The pending restore is cancelled now (and rescheduled after the
+            # paste) so it cannot fire between setting the clipboard and pasting.
+            # Skipped entirely when restoration is disabled.
+            original_clipboard = ""
+            if self.preserve_clipboard:
+                with self._restore_lock:
+                    restore_pending = self._restore_timer is not None
+                    original_clipboard = self._clipboard_to_restore
+                    if restore_pending:
+                        self._restore_timer.cancel()
+                        self._restore_timer = None
+                if not restore_pending:
+                    try:
+                        original_clipboard = self._paste_from_clipboard()
+                    except:
+                        original_clipboard = ""
 
             # Set new clipboard content
-            pyperclip.copy(text)
+            self._copy_to_clipboard(text)
 
-            # Small delay to ensure clipboard is set
-            time.sleep(0.1)
+            # Wait until the clipboard actually holds the text before pasting
+            self._wait_for_clipboard(text)
 
             # Paste using ydotool Ctrl+V (if ydotool is available)
             if self.ydotool_available:
                 # Use ydotool to send Ctrl+V
                 result = subprocess.run(
-                    ['ydotool', 'key', '29:1', '47:1', '47:0', '29:0'],
+                    self._ctrl_v_cmd,
                     capture_output=True,
                     timeout=5,
                     env=self._get_ydotool_env()
@@ -283,38 +460,61 @@ class TextInjector:
                 if result.returncode != 0:
                     self._log_ydotool_failure(result)
             else:
-                print("No method available to send paste command")
-                print("   Text has been copied to clipboard - paste manually with Ctrl+V")
+                log.warning("No method available to send paste command")
+                log.warning("Text has been copied to clipboard - paste manually with Ctrl+V")
 
             # Restore original clipboard after a delay
-            def restore_clipboard():
-                time.sleep(2.0)  # Wait 2 seconds before restoring
-                try:
-                    pyperclip.copy(original_clipboard)
-                except:
-                    pass  # Ignore restore errors
+            if self.preserve_clipboard:
+                self._schedule_clipboard_restore(original_clipboard)
 
-            # Run restore in a separate thread so it doesn't block
-            import threading
-            restore_thread = threading.Thread(target=restore_clipboard, daemon=True)
-            restore_thread.start()
-
-            print("Text copied to clipboard and paste command sent")
+            log.debug("Text copied to clipboard and paste command sent")
             return True
 
         except Exception as e:
-            print(f"ERROR: Clipboard injection failed: {e}")
+            log.error("Clipboard injection failed: %s", e)
             return False
 
+    def _schedule_clipboard_restore(self, content: str, delay: float = 2.0):
+        """(Re)start the single timer that puts content back on the clipboard"""
+        with self._restore_lock:
+            if self._restore_timer is not None:
+                self._restore_timer.cancel()
+            self._clipboard_to_restore = content
+            self._restore_timer = threading.Timer(delay, self._restore_clipboard)
+            self._restore_timer.daemon = True
+            self._restore_timer.start()
+
+    def _restore_clipboard(self):
+        """Timer callback restoring the clipboard saved before injection"""
+        with self._restore_lock:
+            # A newer injection rescheduled the restore after this timer fired
+            if self._restore_timer is not threading.current_thread():
+                return
+            content = self._clipboard_to_restore
+            self._restore_timer = None
+            self._clipboard_to_restore = ""
+        try:
+            self._copy_to_clipboard(content)
+        except:
+            pass  # Ignore restore errors
+
+    def stop(self):
+        """Cancel any pending clipboard restore"""
+        with self._restore_lock:
+            if self._restore_timer is not None:
+                self._restore_timer.cancel()
+                self._restore_timer = None
+
     def set_use_clipboard_fallback(self, use_clipboard: bool):
         """Enable or disable clipboard fallback"""
         self.use_clipboard_fallback = use_clipboard
-        print(f"Clipboard fallback {'enabled' if use_clipboard else 'disabled'}")
+        log.info("Clipboard fallback %s", 'enabled' if use_clipboard else 'disabled')
 
     def get_status(self) -> dict:
         """Get the status of the text injector"""
         return {
             'ydotool_available': self.ydotool_available,
             'key_delay': self.key_delay,
-            'use_clipboard_fallback': self.use_clipboard_fallback
+            'use_clipboard_fallback': self.use_clipboard_fallback,
+            'preserve_clipboard': self.preserve_clipboard
         }
@@ -11,9 +11,9 @@ import numpy as np
 from pathlib import Path
 from typing import Optional
 try:
-    from .config_manager import ConfigManager
+    from .config_manager import ConfigManager, get_config_manager
 except ImportError:
-    from config_manager import ConfigManager
+    from config_manager import ConfigManager, get_config_manager
 
 
 class WhisperManager:
@@ -21,7 +21,7 @@ class WhisperManager:
     
     def __init__(self, config_manager: Optional[ConfigManager] = None):
         if config_manager is None:
-            self.config = ConfigManager()
+            self.config = get_config_manager()
         else:
             self.config = config_manager
             